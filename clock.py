@@ -6,13 +6,20 @@
 """
 
 import pygame
+import argparse
 import sys
 import os
 import platform
 import time
+import json
+import threading
+import traceback
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 from pathlib import Path
 
+from memory_governor import MemoryGovernor
+
 # 初始化 Pygame
 pygame.init()
 
@@ -59,15 +66,70 @@ def get_chinese_font():
     # 如果没有找到中文字体，返回None
     return None
 
+# 每帧的只读状态快照：主线程生成，渲染线程只根据快照绘制
+ClockSnapshot = namedtuple("ClockSnapshot", [
+    "time_str",  # 时间文字
+    "date_str",  # 日期文字
+    "use_background_photos",  # 是否显示照片背景
+    "photo_index",  # 当前照片索引
+    "photo_scale_mode",  # 照片缩放模式
+    "hint_alpha",  # 导航提示透明度（0 表示不显示）
+    "timer_text",  # 计时器文字（None 表示不显示）
+    "timer_color",  # 计时器颜色
+    "alert_shown",  # 是否处于到时提醒中
+    "alert_visible",  # 到时提醒当前是否亮起（闪烁效果）
+])
+
+class DoubleBuffer:
+    """双缓冲交接
+    
+    生产者写好后台缓冲后调用 swap() 与前台交换，消费者总是取得最新完成的前台缓冲。
+    消费者使用前台缓冲期间应持有 condition，生产者的下一次交换会等待其用完。
+    """
+    
+    def __init__(self, front=None, back=None):
+        self.condition = threading.Condition()
+        self.front = front
+        self.back = back
+        self.version = 0  # 每次交换加 1
+        self.closed = False
+    
+    def swap(self, value=None):
+        """交换前后台缓冲；value 不为 None 时先放入后台缓冲"""
+        with self.condition:
+            if value is not None:
+                self.back = value
+            self.front, self.back = self.back, self.front
+            self.version += 1
+            self.condition.notify_all()
+    
+    def wait(self, version, timeout=None):
+        """等待比 version 更新的前台缓冲，返回 (版本号, 前台缓冲)；超时或关闭时版本号不变"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version or self.closed, timeout)
+            return self.version, self.front
+    
+    def close(self):
+        """关闭交接，唤醒等待的线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
 class SimpleClock:
-    def __init__(self, width=1920, height=1080, fullscreen=True):
+    def __init__(self, width=1920, height=1080, fullscreen=True, framebuffer=None):
         """初始化时钟应用"""
         self.width = width
         self.height = height
         self.fullscreen = fullscreen
+        self.framebuffer = framebuffer  # 帧缓冲输出后端（None 表示使用 SDL 窗口）
         
         # 设置显示模式
-        if self.fullscreen:
+        if self.framebuffer is not None:
+            # 画面直接写入帧缓冲，不需要 SDL 窗口
+            self.width = framebuffer.info.width
+            self.height = framebuffer.info.height
+            self.screen = None
+        elif self.fullscreen:
             self.screen = pygame.display.set_mode((width, height), pygame.FULLSCREEN)
         else:
             self.screen = pygame.display.set_mode((width, height))
@@ -107,14 +169,25 @@ class SimpleClock:
         
         # 照片配置
         self.photos_dir = "photos"  # 照片目录
-        self.photos = []
+        self.photos = []  # 照片文件路径（按需解码）
         self.current_photo_index = 0
         self.photo_scale_mode = "cover"  # cover: 覆盖整个屏幕，fit: 适应屏幕
         self.photo_display_time = 10  # 每张照片显示时间（秒）
-        self.last_photo_change = time.time()
+        self.last_photo_change = time.monotonic()
         self.use_background_photos = True  # 是否使用背景照片
         self.auto_switch_photos = False  # 是否自动切换照片（默认关闭，手动切换）
         
+        # 缓存配置（由内存调节器根据内存压力动态调整）
+        self.photo_cache = OrderedDict()  # 已解码照片缓存: 路径 -> (解码比例, Surface)
+        self.photo_cache_size = 4  # 最多缓存的已解码照片数
+        self.background_cache = OrderedDict()  # 已缩放背景缓存: (照片索引, 缩放模式) -> Surface
+        self.background_cache_size = 2  # 最多缓存的已缩放背景数
+        self.photo_decode_scale = 1.0  # 解码后保留的分辨率（相对屏幕尺寸的比例）
+        self.keep_idle_fonts = True  # 是否保留暂时不用的字体
+        self.font_cache = {}  # 按需加载的字体缓存: 字号 -> Font
+        self.bad_photos = set()  # 无法解码的照片路径（不再重试）
+        self.memory_governor = MemoryGovernor(frame_bytes=self.width * self.height * 4)
+        
         # 加载照片
         self.load_photos()
         
@@ -140,7 +213,7 @@ class SimpleClock:
         self.hint_arrow_size = int(self.height * 0.03)  # 箭头大小
         self.hint_arrow_color = (255, 255, 255, 150)  # 半透明白色
         self.hint_fade_time = 5  # 提示显示时间（秒）
-        self.hint_start_time = time.time()
+        self.hint_start_time = time.monotonic()
         
         # 计时器配置
         self.timer_set_time = 0  # 设置的计时时间（秒）
@@ -156,6 +229,11 @@ class SimpleClock:
         self.timer_alert_start_time = None  # 提示显示开始时间
         self.timer_alert_duration = 10  # 提示显示持续时间（秒）
         
+        # 渲染线程（在 run 中启动）
+        self.snapshots = DoubleBuffer()  # 主线程 -> 渲染线程：最新的状态快照
+        self.frames = None  # 渲染线程 -> 主线程：绘制完成的画面
+        self.render_error = None  # 渲染线程中的异常
+        
         # 加载计时器字体
         chinese_font_path = get_chinese_font()
         if chinese_font_path:
@@ -174,57 +252,197 @@ class SimpleClock:
             self.use_background_photos = False
             return
         
+        # 优先使用预处理工具生成的照片清单（照片已按显示分辨率处理好）
+        if self.load_photo_manifest(photos_path):
+            return
+        
         # 支持的图片格式
         image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
         
-        for file in photos_path.iterdir():
+        # 启动时只记录文件路径，照片在显示时按需解码，避免一次性占满内存
+        for file in sorted(photos_path.iterdir()):
             if file.suffix.lower() in image_extensions:
-                try:
-                    img = pygame.image.load(str(file))
-                    self.photos.append(img)
-                    print(f"加载照片: {file.name}")
-                except Exception as e:
-                    print(f"无法加载照片 {file.name}: {e}")
+                self.photos.append(file)
+                print(f"找到照片: {file.name}")
         
         if len(self.photos) == 0:
-            print(f"警告: 照片目录中没有找到有效图片，将只显示时钟")
+            print("警告: 照片目录中没有找到有效图片，将只显示时钟")
             self.use_background_photos = False
         else:
             print(f"成功加载 {len(self.photos)} 张照片")
     
+    def load_photo_manifest(self, photos_path):
+        """读取 ingest_photos.py 生成的照片清单，成功时返回 True"""
+        manifest_path = photos_path / "manifest.json"
+        if not manifest_path.exists():
+            return False
+        
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            target = manifest.get("target", {})
+            target_size = (target.get("width"), target.get("height"))
+            files = [photos_path / entry["file"] for entry in manifest["photos"]]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"警告: 无法读取照片清单 {manifest_path}: {e}，改为扫描照片目录")
+            return False
+        
+        if target_size != (self.width, self.height):
+            print(f"提示: 照片清单的分辨率 {target_size[0]}x{target_size[1]} "
+                  f"与屏幕 {self.width}x{self.height} 不同，建议重新运行 ingest_photos.py")
+        
+        for file in files:
+            if file.exists():
+                self.photos.append(file)
+        
+        if len(self.photos) == 0:
+            print("警告: 照片清单中没有有效图片，将只显示时钟")
+            self.use_background_photos = False
+        else:
+            print(f"从照片清单加载 {len(self.photos)} 张照片")
+        return True
+    
+    def decode_photo(self, path, decode_scale):
+        """解码照片，并缩小到屏幕尺寸乘以解码比例以内以节省内存"""
+        img = pygame.image.load(str(path))
+        photo_width, photo_height = img.get_size()
+        max_width = max(1, int(self.width * decode_scale))
+        max_height = max(1, int(self.height * decode_scale))
+        
+        # 按覆盖模式所需的尺寸缩小，原图比这更小时保持不变
+        scale = max(max_width / photo_width, max_height / photo_height)
+        if scale < 1:
+            size = (max(1, int(photo_width * scale)), max(1, int(photo_height * scale)))
+            img = pygame.transform.smoothscale(img, size)
+        return img
+    
+    def get_photo(self, index):
+        """获取已解码的照片（带 LRU 缓存），解码失败时返回 None"""
+        path = self.photos[index]
+        if path in self.bad_photos:
+            return None
+        cached = self.photo_cache.get(path)
+        if cached is not None:
+            decode_scale, img = cached
+            # 内存恢复后，低分辨率解码的照片会按当前比例重新解码
+            if decode_scale >= self.photo_decode_scale:
+                self.photo_cache.move_to_end(path)
+                return img
+            del self.photo_cache[path]
+        
+        try:
+            img = self.decode_photo(path, self.photo_decode_scale)
+        except Exception as e:
+            print(f"无法加载照片 {path.name}: {e}，已跳过")
+            self.bad_photos.add(path)
+            return None
+        
+        self.photo_cache[path] = (self.photo_decode_scale, img)
+        self.trim_cache(self.photo_cache, self.photo_cache_size)
+        return img
+    
+    def trim_cache(self, cache, max_size):
+        """按最近最少使用顺序淘汰缓存，返回淘汰的数量"""
+        evicted = 0
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+            evicted += 1
+        return evicted
+    
+    def get_font(self, size):
+        """获取指定字号的中文字体（带缓存）"""
+        font = self.font_cache.get(size)
+        if font is None:
+            try:
+                chinese_font_path = get_chinese_font()
+                if chinese_font_path:
+                    font = pygame.font.Font(chinese_font_path, size)
+                else:
+                    font = pygame.font.Font(None, size)
+            except:
+                font = pygame.font.Font(None, size)
+            self.font_cache[size] = font
+        return font
+    
+    def apply_memory_budget(self, budget, alert_shown=False):
+        """应用内存调节器给出的缓存预算"""
+        self.photo_cache_size = budget.photo_cache_size
+        self.background_cache_size = budget.background_cache_size
+        self.keep_idle_fonts = budget.keep_fonts
+        
+        if budget.decode_scale != self.photo_decode_scale:
+            # 解码分辨率变化时丢弃已缩放的背景，按新分辨率的照片重新生成
+            self.background_cache.clear()
+        if budget.decode_scale < self.photo_decode_scale:
+            # 降低解码分辨率时丢弃高分辨率的照片，下次使用时重新解码
+            self.photo_cache.clear()
+        self.photo_decode_scale = budget.decode_scale
+        
+        evicted_photos = self.trim_cache(self.photo_cache, self.photo_cache_size)
+        evicted_backgrounds = self.trim_cache(self.background_cache, self.background_cache_size)
+        if evicted_photos or evicted_backgrounds:
+            print(f"内存调节: 释放 {evicted_photos} 张照片缓存, {evicted_backgrounds} 张背景缓存")
+        
+        # 释放暂时不用的字体（提醒字体只在计时器到时提醒时使用）
+        if not self.keep_idle_fonts and not alert_shown and self.font_cache:
+            print(f"内存调节: 释放 {len(self.font_cache)} 个闲置字体")
+            self.font_cache.clear()
+    
+    def print_memory_metrics(self):
+        """打印内存调节指标"""
+        metrics = self.memory_governor.metrics()
+        metrics["photo_cache_used"] = len(self.photo_cache)
+        metrics["background_cache_used"] = len(self.background_cache)
+        metrics["font_cache_used"] = len(self.font_cache)
+        print("内存指标:")
+        for key, value in metrics.items():
+            print(f"  {key}: {value}")
+    
+    def step_photo(self, step):
+        """按方向移动照片索引，跳过无法解码的照片"""
+        for _ in range(len(self.photos)):
+            self.current_photo_index = (self.current_photo_index + step) % len(self.photos)
+            if self.photos[self.current_photo_index] not in self.bad_photos:
+                break
+    
     def next_photo(self):
         """切换到下一张照片"""
         if len(self.photos) > 0:
-            self.current_photo_index = (self.current_photo_index + 1) % len(self.photos)
-            self.last_photo_change = time.time()
-            self.hint_start_time = time.time()  # 重置提示显示时间
+            self.step_photo(1)
+            self.last_photo_change = time.monotonic()
+            self.hint_start_time = time.monotonic()  # 重置提示显示时间
             print(f"切换到照片: {self.current_photo_index + 1}/{len(self.photos)}")
     
     def prev_photo(self):
         """切换到上一张照片"""
         if len(self.photos) > 0:
-            self.current_photo_index = (self.current_photo_index - 1) % len(self.photos)
-            self.last_photo_change = time.time()
-            self.hint_start_time = time.time()  # 重置提示显示时间
+            self.step_photo(-1)
+            self.last_photo_change = time.monotonic()
+            self.hint_start_time = time.monotonic()  # 重置提示显示时间
             print(f"切换到照片: {self.current_photo_index + 1}/{len(self.photos)}")
     
-    def get_background_surface(self):
+    def get_background_surface(self, snapshot):
         """获取背景（照片或纯色）"""
-        if self.use_background_photos and len(self.photos) > 0:
-            # 只有在启用自动切换时才自动切换照片
-            if self.auto_switch_photos:
-                current_time = time.time()
-                if current_time - self.last_photo_change >= self.photo_display_time:
-                    self.next_photo()
+        if snapshot.use_background_photos:
+            # 已缩放的背景直接使用缓存，避免每帧重复缩放
+            cache_key = (snapshot.photo_index, snapshot.photo_scale_mode)
+            background = self.background_cache.get(cache_key)
+            if background is not None:
+                self.background_cache.move_to_end(cache_key)
+                return background
             
             # 获取当前照片
-            photo = self.photos[self.current_photo_index]
+            photo = self.get_photo(snapshot.photo_index)
+            if photo is None:
+                background = pygame.Surface((self.width, self.height))
+                background.fill(self.bg_color)
+                return background
             photo_width, photo_height = photo.get_size()
             
             # 创建背景表面
             background = pygame.Surface((self.width, self.height))
             
-            if self.photo_scale_mode == "cover":
+            if snapshot.photo_scale_mode == "cover":
                 # 覆盖模式：缩放照片以填满整个屏幕
                 scale_x = self.width / photo_width
                 scale_y = self.height / photo_height
@@ -260,6 +478,8 @@ class SimpleClock:
             overlay.fill((0, 0, 0))
             background.blit(overlay, (0, 0))
             
+            self.background_cache[cache_key] = background
+            self.trim_cache(self.background_cache, self.background_cache_size)
             return background
         else:
             # 纯色背景
@@ -314,11 +534,11 @@ class SimpleClock:
         if self.timer_set_time > 0:
             if self.timer_paused:
                 # 从暂停状态恢复
-                self.timer_start_time = time.time() - (self.timer_set_time - self.timer_remaining)
+                self.timer_start_time = time.monotonic() - (self.timer_set_time - self.timer_remaining)
                 self.timer_paused = False
             else:
                 # 新启动
-                self.timer_start_time = time.time()
+                self.timer_start_time = time.monotonic()
                 self.timer_remaining = self.timer_set_time
             self.timer_running = True
             self.timer_alert_shown = False
@@ -342,80 +562,122 @@ class SimpleClock:
     def update_timer(self):
         """更新计时器状态"""
         if self.timer_running and not self.timer_paused:
-            elapsed = time.time() - self.timer_start_time
+            elapsed = time.monotonic() - self.timer_start_time
             self.timer_remaining = max(0, self.timer_set_time - elapsed)
             
             # 检查是否到时间
             if self.timer_remaining <= 0 and not self.timer_alert_shown:
                 self.timer_running = False
                 self.timer_alert_shown = True
-                self.timer_alert_start_time = time.time()
+                self.timer_alert_start_time = time.monotonic()
                 print("计时器到时间了！")
     
-    def draw_timer(self, surface):
-        """在右下角绘制计时器"""
-        if self.timer_set_time <= 0 and not self.timer_alert_shown:
-            return  # 如果没有设置计时器且没有提示，不显示
+    def update_state(self, now):
+        """更新照片自动切换和计时器状态（在主线程中运行）"""
+        # 只有在启用自动切换时才自动切换照片
+        if self.use_background_photos and len(self.photos) > 0 and self.auto_switch_photos:
+            if now - self.last_photo_change >= self.photo_display_time:
+                self.next_photo()
+        
+        # 当前照片无法解码时跳到下一张可用的照片
+        if (len(self.photos) > 0 and self.photos[self.current_photo_index] in self.bad_photos
+                and len(self.bad_photos) < len(self.photos)):
+            self.step_photo(1)
         
         # 更新计时器
         self.update_timer()
         
+        # 提示显示时间结束，自动关闭
+        if self.timer_alert_shown and now - self.timer_alert_start_time >= self.timer_alert_duration:
+            self.timer_alert_shown = False
+    
+    def get_timer_display(self, now):
+        """计算计时器的显示内容，返回 (文字, 颜色, 提醒是否亮起)，不显示时文字为 None"""
+        if self.timer_set_time <= 0 and not self.timer_alert_shown:
+            return None, None, False  # 如果没有设置计时器且没有提示，不显示
+        
         # 如果正在显示提示
         if self.timer_alert_shown:
-            current_time = time.time()
-            elapsed = current_time - self.timer_alert_start_time
-            
-            if elapsed < self.timer_alert_duration:
-                # 显示提示（闪烁效果）
-                flash_interval = 0.5  # 闪烁间隔（秒）
-                visible = (int(elapsed / flash_interval) % 2) == 0
-                
-                if visible:
-                    # 绘制提示文字（居中显示）
-                    alert_text = "时间到！"
-                    if not self.has_chinese_font:
-                        alert_text = "Time Up!"
-                    
-                    alert_font_size = int(self.height * 0.1)
-                    try:
-                        chinese_font_path = get_chinese_font()
-                        if chinese_font_path:
-                            alert_font = pygame.font.Font(chinese_font_path, alert_font_size)
-                        else:
-                            alert_font = pygame.font.Font(None, alert_font_size)
-                    except:
-                        alert_font = pygame.font.Font(None, alert_font_size)
-                    
-                    alert_surface = alert_font.render(alert_text, True, (255, 0, 0))  # 红色
-                    alert_rect = alert_surface.get_rect(center=(self.width // 2, self.height // 2))
-                    
-                    # 绘制半透明背景
-                    overlay = pygame.Surface((self.width, self.height))
-                    overlay.set_alpha(200)
-                    overlay.fill((0, 0, 0))
-                    surface.blit(overlay, (0, 0))
-                    
-                    # 绘制提示文字
-                    surface.blit(alert_surface, alert_rect)
-            else:
-                # 提示显示时间结束，自动关闭
-                self.timer_alert_shown = False
+            # 显示提示（闪烁效果）
+            elapsed = now - self.timer_alert_start_time
+            flash_interval = 0.5  # 闪烁间隔（秒）
+            visible = (int(elapsed / flash_interval) % 2) == 0
             
             # 在右下角也显示计时器状态
-            timer_text = "00:00"
-            timer_color = (255, 0, 0)  # 红色表示到时间
+            return "00:00", (255, 0, 0), visible  # 红色表示到时间
+        
+        # 显示剩余时间
+        timer_text = self.format_timer(self.timer_remaining)
+        if self.timer_running:
+            timer_color = (255, 255, 255)  # 白色表示运行中
+        elif self.timer_paused:
+            timer_color = (255, 255, 0)  # 黄色表示暂停
         else:
-            # 显示剩余时间
-            timer_text = self.format_timer(self.timer_remaining)
-            if self.timer_running:
-                timer_color = (255, 255, 255)  # 白色表示运行中
-            elif self.timer_paused:
-                timer_color = (255, 255, 0)  # 黄色表示暂停
-            else:
-                timer_color = (150, 150, 150)  # 灰色表示未启动
+            timer_color = (150, 150, 150)  # 灰色表示未启动
+        return timer_text, timer_color, False
+    
+    def get_hint_alpha(self, now):
+        """计算导航提示的透明度，不显示时返回 0"""
+        if not self.show_navigation_hints or not self.use_background_photos or len(self.photos) <= 1:
+            return 0
+        
+        # 检查提示显示时间
+        if now - self.hint_start_time > self.hint_fade_time:
+            return 0
+        
+        # 计算透明度（渐变淡出）
+        fade_progress = (now - self.hint_start_time) / self.hint_fade_time
+        return max(0, int(150 * (1 - fade_progress)))
+    
+    def make_snapshot(self, now):
+        """生成当前状态的只读快照"""
+        # 根据是否加载了中文字体来决定使用中文还是英文格式
+        if self.has_chinese_font:
+            date_str = self.get_date_string()
+        else:
+            date_str = self.get_date_string_en()
+        
+        timer_text, timer_color, alert_visible = self.get_timer_display(now)
+        return ClockSnapshot(
+            time_str=self.get_time_string(),
+            date_str=date_str,
+            use_background_photos=self.use_background_photos and len(self.photos) > 0,
+            photo_index=self.current_photo_index,
+            photo_scale_mode=self.photo_scale_mode,
+            hint_alpha=self.get_hint_alpha(now),
+            timer_text=timer_text,
+            timer_color=timer_color,
+            alert_shown=self.timer_alert_shown,
+            alert_visible=alert_visible,
+        )
+    
+    def draw_timer(self, surface, snapshot):
+        """在右下角绘制计时器"""
+        if snapshot.timer_text is None:
+            return
+        
+        if snapshot.alert_visible:
+            # 绘制提示文字（居中显示）
+            alert_text = "时间到！"
+            if not self.has_chinese_font:
+                alert_text = "Time Up!"
+            
+            alert_font = self.get_font(int(self.height * 0.1))
+            
+            alert_surface = alert_font.render(alert_text, True, (255, 0, 0))  # 红色
+            alert_rect = alert_surface.get_rect(center=(self.width // 2, self.height // 2))
+            
+            # 绘制半透明背景
+            overlay = pygame.Surface((self.width, self.height))
+            overlay.set_alpha(200)
+            overlay.fill((0, 0, 0))
+            surface.blit(overlay, (0, 0))
+            
+            # 绘制提示文字
+            surface.blit(alert_surface, alert_rect)
         
         # 渲染计时器文字
-        timer_surface = self.timer_font.render(timer_text, True, timer_color)
+        timer_surface = self.timer_font.render(snapshot.timer_text, True, snapshot.timer_color)
         timer_rect = timer_surface.get_rect()
         timer_rect.right = self.width - 20  # 距离右边缘20像素
         timer_rect.bottom = self.height - 20  # 距离下边缘20像素
@@ -430,19 +692,9 @@ class SimpleClock:
         # 绘制计时器文字
         surface.blit(timer_surface, timer_rect)
     
-    def draw_navigation_hints(self, surface):
+    def draw_navigation_hints(self, surface, snapshot):
         """绘制左右箭头提示"""
-        if not self.show_navigation_hints or not self.use_background_photos or len(self.photos) <= 1:
-            return
-        
-        # 检查提示显示时间
-        current_time = time.time()
-        if current_time - self.hint_start_time > self.hint_fade_time:
-            return
-        
-        # 计算透明度（渐变淡出）
-        fade_progress = (current_time - self.hint_start_time) / self.hint_fade_time
-        alpha = int(150 * (1 - fade_progress))
+        alpha = snapshot.hint_alpha
         if alpha <= 0:
             return
         
@@ -472,52 +724,115 @@ class SimpleClock:
         ]
         pygame.draw.polygon(surface, arrow_color[:3], arrow_points_right)
     
-    def run(self):
-        """运行主循环"""
-        clock = pygame.time.Clock()
-        running = True
-        
-        while running:
-            # 处理事件
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-                    elif event.key == pygame.K_f:
-                        # 切换全屏模式
-                        self.fullscreen = not self.fullscreen
-                        if self.fullscreen:
-                            self.screen = pygame.display.set_mode(
-                                (self.width, self.height), pygame.FULLSCREEN
-                            )
-                        else:
-                            self.screen = pygame.display.set_mode((self.width, self.height))
-                    elif event.key == pygame.K_b:
-                        # 切换背景模式（纯色/照片）
-                        self.use_background_photos = not self.use_background_photos
-                    elif event.key == pygame.K_s:
-                        # 切换照片缩放模式
-                        self.photo_scale_mode = "cover" if self.photo_scale_mode == "fit" else "fit"
-                        print(f"照片模式: {self.photo_scale_mode}")
-                    elif event.key == pygame.K_a:
-                        # 切换自动/手动切换模式
-                        self.auto_switch_photos = not self.auto_switch_photos
-                        mode = "自动切换" if self.auto_switch_photos else "手动切换"
-                        print(f"照片切换模式: {mode}")
-                    elif event.key == pygame.K_LEFT:
-                        # 上一张照片
+    def handle_event(self, event):
+        """处理一个输入事件，收到退出请求时返回 False"""
+        if event.type == pygame.QUIT:
+            return False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return False
+            elif event.key == pygame.K_f and self.framebuffer is None:
+                # 切换全屏模式
+                self.fullscreen = not self.fullscreen
+                if self.fullscreen:
+                    self.screen = pygame.display.set_mode(
+                        (self.width, self.height), pygame.FULLSCREEN
+                    )
+                else:
+                    self.screen = pygame.display.set_mode((self.width, self.height))
+            elif event.key == pygame.K_b:
+                # 切换背景模式（纯色/照片）
+                self.use_background_photos = not self.use_background_photos
+            elif event.key == pygame.K_s:
+                # 切换照片缩放模式
+                self.photo_scale_mode = "cover" if self.photo_scale_mode == "fit" else "fit"
+                print(f"照片模式: {self.photo_scale_mode}")
+            elif event.key == pygame.K_a:
+                # 切换自动/手动切换模式
+                self.auto_switch_photos = not self.auto_switch_photos
+                mode = "自动切换" if self.auto_switch_photos else "手动切换"
+                print(f"照片切换模式: {mode}")
+            elif event.key == pygame.K_m:
+                # 打印内存调节指标
+                self.print_memory_metrics()
+            elif event.key == pygame.K_LEFT:
+                # 上一张照片
+                if self.use_background_photos and len(self.photos) > 0:
+                    self.prev_photo()
+            elif event.key == pygame.K_RIGHT:
+                # 下一张照片
+                if self.use_background_photos and len(self.photos) > 0:
+                    self.next_photo()
+            elif event.key == pygame.K_t:
+                # 计时器控制
+                if self.timer_set_time <= 0:
+                    # 如果没有设置，默认设置为25分钟（番茄钟）
+                    self.set_timer(25)
+                    self.start_timer()
+                elif self.timer_running:
+                    self.pause_timer()
+                elif self.timer_paused:
+                    self.start_timer()
+                else:
+                    self.start_timer()
+            elif event.key == pygame.K_r:
+                # 重置计时器（同时关闭提示）
+                if self.timer_alert_shown:
+                    self.timer_alert_shown = False
+                self.reset_timer()
+            elif event.key >= pygame.K_1 and event.key <= pygame.K_9:
+                # 数字键设置计时器（1-9对应10-90分钟）
+                minutes = (event.key - pygame.K_0) * 10
+                self.set_timer(minutes)
+                self.start_timer()
+            elif event.key >= pygame.K_KP1 and event.key <= pygame.K_KP9:
+                # 小键盘数字键
+                minutes = (event.key - pygame.K_KP0) * 10
+                self.set_timer(minutes)
+                self.start_timer()
+        # 触摸事件处理
+        elif event.type == pygame.FINGERDOWN:
+            # 手指按下
+            self.touch_start_pos = (event.x * self.width, event.y * self.height)
+            self.touch_start_time = time.monotonic()
+            self.hint_start_time = time.monotonic()  # 重置提示
+        elif event.type == pygame.FINGERUP:
+            # 手指抬起，检测是否是点击或滑动
+            if self.touch_start_pos:
+                touch_end_pos = (event.x * self.width, event.y * self.height)
+                touch_duration = time.monotonic() - self.touch_start_time
+                
+                dx = touch_end_pos[0] - self.touch_start_pos[0]
+                dy = touch_end_pos[1] - self.touch_start_pos[1]
+                
+                # 检测滑动
+                if abs(dx) > self.swipe_threshold and touch_duration < self.swipe_time_threshold:
+                    # 水平滑动
+                    if dx > 0:
+                        # 向右滑动 - 上一张
                         if self.use_background_photos and len(self.photos) > 0:
                             self.prev_photo()
-                    elif event.key == pygame.K_RIGHT:
-                        # 下一张照片
+                    else:
+                        # 向左滑动 - 下一张
                         if self.use_background_photos and len(self.photos) > 0:
                             self.next_photo()
-                    elif event.key == pygame.K_t:
-                        # 计时器控制
-                        if self.timer_set_time <= 0:
-                            # 如果没有设置，默认设置为25分钟（番茄钟）
+                elif abs(dx) < 30 and abs(dy) < 30 and touch_duration < 0.3:
+                    # 点击（短距离，短时间）
+                    click_x = self.touch_start_pos[0]
+                    click_y = self.touch_start_pos[1]
+                    
+                    # 检查是否点击右下角（计时器区域）或提示区域
+                    timer_area_width = 150
+                    timer_area_height = 80
+                    # 检查是否点击计时器区域或屏幕中心（关闭提示）
+                    if (click_x > self.width - timer_area_width and 
+                        click_y > self.height - timer_area_height):
+                        # 点击计时器区域
+                        if self.timer_alert_shown:
+                            # 如果正在显示提示，关闭提示
+                            self.timer_alert_shown = False
+                        elif self.timer_set_time <= 0:
+                            # 如果没有设置，默认设置25分钟
                             self.set_timer(25)
                             self.start_timer()
                         elif self.timer_running:
@@ -526,198 +841,269 @@ class SimpleClock:
                             self.start_timer()
                         else:
                             self.start_timer()
-                    elif event.key == pygame.K_r:
-                        # 重置计时器（同时关闭提示）
+                    elif self.timer_alert_shown:
+                        # 如果正在显示提示，点击任意位置关闭
+                        self.timer_alert_shown = False
+                    else:
+                        # 点击其他区域 - 切换照片
+                        if click_x < self.width / 2:
+                            # 点击左侧 - 上一张
+                            if self.use_background_photos and len(self.photos) > 0:
+                                self.prev_photo()
+                        else:
+                            # 点击右侧 - 下一张
+                            if self.use_background_photos and len(self.photos) > 0:
+                                self.next_photo()
+                
+                self.touch_start_pos = None
+                self.touch_start_time = None
+        # 鼠标事件（用于非触摸屏设备，鼠标点击也可以切换）
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:  # 左键
+                mouse_pos = pygame.mouse.get_pos()
+                self.touch_start_pos = mouse_pos
+                self.touch_start_time = time.monotonic()
+                self.hint_start_time = time.monotonic()
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1 and self.touch_start_pos:  # 左键
+                mouse_pos = pygame.mouse.get_pos()
+                touch_duration = time.monotonic() - self.touch_start_time
+                
+                dx = mouse_pos[0] - self.touch_start_pos[0]
+                dy = mouse_pos[1] - self.touch_start_pos[1]
+                
+                # 检测滑动
+                if abs(dx) > self.swipe_threshold and touch_duration < self.swipe_time_threshold:
+                    if dx > 0:
+                        if self.use_background_photos and len(self.photos) > 0:
+                            self.prev_photo()
+                    else:
+                        if self.use_background_photos and len(self.photos) > 0:
+                            self.next_photo()
+                elif abs(dx) < 30 and abs(dy) < 30 and touch_duration < 0.3:
+                    # 点击
+                    click_x = self.touch_start_pos[0]
+                    click_y = self.touch_start_pos[1]
+                    
+                    # 检查是否点击右下角（计时器区域）或提示区域
+                    timer_area_width = 150
+                    timer_area_height = 80
+                    # 检查是否点击计时器区域或屏幕中心（关闭提示）
+                    if (click_x > self.width - timer_area_width and 
+                        click_y > self.height - timer_area_height):
+                        # 点击计时器区域
                         if self.timer_alert_shown:
+                            # 如果正在显示提示，关闭提示
                             self.timer_alert_shown = False
-                        self.reset_timer()
-                    elif event.key >= pygame.K_1 and event.key <= pygame.K_9:
-                        # 数字键设置计时器（1-9对应10-90分钟）
-                        minutes = (event.key - pygame.K_0) * 10
-                        self.set_timer(minutes)
-                        self.start_timer()
-                    elif event.key >= pygame.K_KP1 and event.key <= pygame.K_KP9:
-                        # 小键盘数字键
-                        minutes = (event.key - pygame.K_KP0) * 10
-                        self.set_timer(minutes)
-                        self.start_timer()
-                # 触摸事件处理
-                elif event.type == pygame.FINGERDOWN:
-                    # 手指按下
-                    self.touch_start_pos = (event.x * self.width, event.y * self.height)
-                    self.touch_start_time = time.time()
-                    self.hint_start_time = time.time()  # 重置提示
-                elif event.type == pygame.FINGERUP:
-                    # 手指抬起，检测是否是点击或滑动
-                    if self.touch_start_pos:
-                        touch_end_pos = (event.x * self.width, event.y * self.height)
-                        touch_duration = time.time() - self.touch_start_time
-                        
-                        dx = touch_end_pos[0] - self.touch_start_pos[0]
-                        dy = touch_end_pos[1] - self.touch_start_pos[1]
-                        
-                        # 检测滑动
-                        if abs(dx) > self.swipe_threshold and touch_duration < self.swipe_time_threshold:
-                            # 水平滑动
-                            if dx > 0:
-                                # 向右滑动 - 上一张
-                                if self.use_background_photos and len(self.photos) > 0:
-                                    self.prev_photo()
-                            else:
-                                # 向左滑动 - 下一张
-                                if self.use_background_photos and len(self.photos) > 0:
-                                    self.next_photo()
-                        elif abs(dx) < 30 and abs(dy) < 30 and touch_duration < 0.3:
-                            # 点击（短距离，短时间）
-                            click_x = self.touch_start_pos[0]
-                            click_y = self.touch_start_pos[1]
-                            
-                            # 检查是否点击右下角（计时器区域）或提示区域
-                            timer_area_width = 150
-                            timer_area_height = 80
-                            # 检查是否点击计时器区域或屏幕中心（关闭提示）
-                            if (click_x > self.width - timer_area_width and 
-                                click_y > self.height - timer_area_height):
-                                # 点击计时器区域
-                                if self.timer_alert_shown:
-                                    # 如果正在显示提示，关闭提示
-                                    self.timer_alert_shown = False
-                                elif self.timer_set_time <= 0:
-                                    # 如果没有设置，默认设置25分钟
-                                    self.set_timer(25)
-                                    self.start_timer()
-                                elif self.timer_running:
-                                    self.pause_timer()
-                                elif self.timer_paused:
-                                    self.start_timer()
-                                else:
-                                    self.start_timer()
-                            elif self.timer_alert_shown:
-                                # 如果正在显示提示，点击任意位置关闭
-                                self.timer_alert_shown = False
-                            else:
-                                # 点击其他区域 - 切换照片
-                                if click_x < self.width / 2:
-                                    # 点击左侧 - 上一张
-                                    if self.use_background_photos and len(self.photos) > 0:
-                                        self.prev_photo()
-                                else:
-                                    # 点击右侧 - 下一张
-                                    if self.use_background_photos and len(self.photos) > 0:
-                                        self.next_photo()
-                        
-                        self.touch_start_pos = None
-                        self.touch_start_time = None
-                # 鼠标事件（用于非触摸屏设备，鼠标点击也可以切换）
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:  # 左键
-                        mouse_pos = pygame.mouse.get_pos()
-                        self.touch_start_pos = mouse_pos
-                        self.touch_start_time = time.time()
-                        self.hint_start_time = time.time()
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    if event.button == 1 and self.touch_start_pos:  # 左键
-                        mouse_pos = pygame.mouse.get_pos()
-                        touch_duration = time.time() - self.touch_start_time
-                        
-                        dx = mouse_pos[0] - self.touch_start_pos[0]
-                        dy = mouse_pos[1] - self.touch_start_pos[1]
-                        
-                        # 检测滑动
-                        if abs(dx) > self.swipe_threshold and touch_duration < self.swipe_time_threshold:
-                            if dx > 0:
-                                if self.use_background_photos and len(self.photos) > 0:
-                                    self.prev_photo()
-                            else:
-                                if self.use_background_photos and len(self.photos) > 0:
-                                    self.next_photo()
-                        elif abs(dx) < 30 and abs(dy) < 30 and touch_duration < 0.3:
-                            # 点击
-                            click_x = self.touch_start_pos[0]
-                            click_y = self.touch_start_pos[1]
-                            
-                            # 检查是否点击右下角（计时器区域）或提示区域
-                            timer_area_width = 150
-                            timer_area_height = 80
-                            # 检查是否点击计时器区域或屏幕中心（关闭提示）
-                            if (click_x > self.width - timer_area_width and 
-                                click_y > self.height - timer_area_height):
-                                # 点击计时器区域
-                                if self.timer_alert_shown:
-                                    # 如果正在显示提示，关闭提示
-                                    self.timer_alert_shown = False
-                                elif self.timer_set_time <= 0:
-                                    self.set_timer(25)
-                                    self.start_timer()
-                                elif self.timer_running:
-                                    self.pause_timer()
-                                elif self.timer_paused:
-                                    self.start_timer()
-                                else:
-                                    self.start_timer()
-                            elif self.timer_alert_shown:
-                                # 如果正在显示提示，点击任意位置关闭
-                                self.timer_alert_shown = False
-                            else:
-                                # 点击其他区域 - 切换照片
-                                if click_x < self.width / 2:
-                                    if self.use_background_photos and len(self.photos) > 0:
-                                        self.prev_photo()
-                                else:
-                                    if self.use_background_photos and len(self.photos) > 0:
-                                        self.next_photo()
-                        
-                        self.touch_start_pos = None
-                        self.touch_start_time = None
-            
-            # 获取背景
-            background = self.get_background_surface()
-            self.screen.blit(background, (0, 0))
-            
-            # 获取时间并渲染
-            time_str = self.get_time_string()
-            
-            # 根据是否加载了中文字体来决定使用中文还是英文格式
-            if self.has_chinese_font:
-                date_str = self.get_date_string()
-            else:
-                date_str = self.get_date_string_en()
-            
-            time_text = self.render_text(time_str, self.clock_font, self.text_color)
-            date_text = self.render_text(date_str, self.date_font, self.text_color)
-            
-            # 获取文字位置（居中）
-            time_rect = time_text.get_rect(center=(self.clock_x, self.clock_y))
-            date_rect = date_text.get_rect(center=(self.date_x, self.date_y))
-            
-            # 绘制文字
-            self.screen.blit(time_text, time_rect)
-            self.screen.blit(date_text, date_rect)
+                        elif self.timer_set_time <= 0:
+                            self.set_timer(25)
+                            self.start_timer()
+                        elif self.timer_running:
+                            self.pause_timer()
+                        elif self.timer_paused:
+                            self.start_timer()
+                        else:
+                            self.start_timer()
+                    elif self.timer_alert_shown:
+                        # 如果正在显示提示，点击任意位置关闭
+                        self.timer_alert_shown = False
+                    else:
+                        # 点击其他区域 - 切换照片
+                        if click_x < self.width / 2:
+                            if self.use_background_photos and len(self.photos) > 0:
+                                self.prev_photo()
+                        else:
+                            if self.use_background_photos and len(self.photos) > 0:
+                                self.next_photo()
+                
+                self.touch_start_pos = None
+                self.touch_start_time = None
+        return True
+    
+    def render_frame(self, surface, snapshot):
+        """根据快照绘制一帧"""
+        # 获取背景
+        background = self.get_background_surface(snapshot)
+        surface.blit(background, (0, 0))
+        
+        # 渲染时间和日期
+        time_text = self.render_text(snapshot.time_str, self.clock_font, self.text_color)
+        date_text = self.render_text(snapshot.date_str, self.date_font, self.text_color)
+        
+        # 获取文字位置（居中）
+        time_rect = time_text.get_rect(center=(self.clock_x, self.clock_y))
+        date_rect = date_text.get_rect(center=(self.date_x, self.date_y))
+        
+        # 绘制文字
+        surface.blit(time_text, time_rect)
+        surface.blit(date_text, date_rect)
+        
+        # 绘制导航提示（左右箭头）
+        self.draw_navigation_hints(surface, snapshot)
+        
+        # 绘制计时器（右下角）
+        self.draw_timer(surface, snapshot)
+    
+    def render_loop(self):
+        """渲染线程：绘制最新的快照到后台缓冲，完成后与前台缓冲交换
+        
+        照片解码、缩放和字体加载都在这里进行，不会阻塞主线程的输入处理。
+        帧缓冲输出不需要 SDL 显示调用，也直接在这里完成。
+        """
+        version = 0
+        rendered = None
+        try:
+            while True:
+                version, snapshot = self.snapshots.wait(version, timeout=0.5)
+                if self.snapshots.closed:
+                    break
+                
+                # 根据内存压力调整缓存（缓存只在渲染线程中使用）
+                budget = self.memory_governor.update()
+                if budget is not None:
+                    self.apply_memory_budget(budget, snapshot is not None and snapshot.alert_shown)
+                
+                # 画面没有变化时不重绘
+                if snapshot is None or snapshot == rendered:
+                    continue
+                
+                self.render_frame(self.frames.back, snapshot)
+                if self.framebuffer is not None:
+                    self.framebuffer.present(self.frames.back)
+                self.frames.swap()
+                rendered = snapshot
+        except Exception as e:
+            traceback.print_exc()
+            self.render_error = e
+    
+    def create_frame_surface(self):
+        """创建与输出像素格式相同的画面缓冲，输出时无需再转换格式"""
+        if self.framebuffer is not None:
+            return self.framebuffer.create_surface()
+        return pygame.Surface((self.width, self.height), 0, self.screen)
+    
+    def present_frame(self, frame):
+        """把绘制完成的画面输出到 SDL 窗口（必须在主线程中调用）"""
+        self.screen.blit(frame, (0, 0))
+        pygame.display.flip()
+    
+    def run(self):
+        """运行主循环：主线程处理输入和计时器，绘制在渲染线程中进行"""
+        clock = pygame.time.Clock()
+        running = True
+        frame_version = 0
+        
+        # 两个与屏幕像素格式相同的画面缓冲，渲染线程和主线程交替使用
+        self.frames = DoubleBuffer(self.create_frame_surface(), self.create_frame_surface())
+        render_thread = threading.Thread(target=self.render_loop, name="render", daemon=True)
+        render_thread.start()
+        
+        while running:
+            # 处理事件
+            for event in pygame.event.get():
+                if not self.handle_event(event):
+                    running = False
             
-            # 绘制导航提示（左右箭头）
-            self.draw_navigation_hints(self.screen)
+            # 更新状态，把最新快照交给渲染线程
+            now = time.monotonic()
+            self.update_state(now)
+            self.snapshots.swap(self.make_snapshot(now))
             
-            # 绘制计时器（右下角）
-            self.draw_timer(self.screen)
+            # 输出渲染线程最新完成的画面（帧缓冲模式下由渲染线程直接输出）
+            if self.framebuffer is None:
+                with self.frames.condition:
+                    if self.frames.version != frame_version:
+                        frame_version = self.frames.version
+                        self.present_frame(self.frames.front)
             
-            # 更新显示
-            pygame.display.flip()
+            if self.render_error is not None:
+                running = False
             clock.tick(30)  # 30 FPS
         
+        self.snapshots.close()
+        render_thread.join()
+        if self.framebuffer is not None:
+            self.framebuffer.close()
         pygame.quit()
-        sys.exit()
+        # 渲染线程出错退出时返回非零状态，便于 systemd 等重新启动
+        sys.exit(1 if self.render_error is not None else 0)
+
+def parse_size(value):
+    """解析 WxH 格式的尺寸"""
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸格式应为 WxH，例如 1920x1080: {value}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"尺寸必须大于 0: {value}")
+    return width, height
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="极简时钟")
+    parser.add_argument("--framebuffer", metavar="PATH",
+                        help="直接输出到帧缓冲设备（如 /dev/fb0），用于没有桌面环境的系统")
+    parser.add_argument("--fb-size", metavar="WxH", type=parse_size,
+                        help="帧缓冲尺寸，输出到普通文件时必须指定（如 1920x1080），需与 --fb-bpp 一起使用")
+    parser.add_argument("--fb-bpp", type=int, choices=(16, 32),
+                        help="帧缓冲像素位数：16 (RGB565) 或 32 (XRGB8888)，需与 --fb-size 一起使用")
+    args = parser.parse_args()
+    
+    if (args.fb_size is None) != (args.fb_bpp is None):
+        parser.error("--fb-size 和 --fb-bpp 需要同时指定")
+    if args.fb_size is not None and not args.framebuffer:
+        parser.error("--fb-size 和 --fb-bpp 只能与 --framebuffer 一起使用")
+    return args
+
+def open_framebuffer(args):
+    """根据命令行参数打开帧缓冲后端"""
+    from framebuffer import FramebufferBackend, FramebufferError
+    
+    width = height = None
+    if args.fb_size:
+        width, height = args.fb_size
+    
+    # 不需要 SDL 窗口：evdev 驱动不输出画面，但会从 /dev/input 读取键盘和触摸事件；
+    # 不可用时退回 dummy 驱动（仍然需要初始化显示才能使用事件队列）
+    pygame.display.quit()
+    for driver in ("evdev", "dummy"):
+        os.environ["SDL_VIDEODRIVER"] = driver
+        try:
+            pygame.display.init()
+            pygame.display.set_mode((1, 1))
+            break
+        except pygame.error as e:
+            print(f"警告: 无法使用 SDL {driver} 驱动: {e}")
+            pygame.display.quit()
+    if pygame.display.get_driver() == "dummy":
+        print("警告: 使用 dummy 驱动，将无法接收键盘和触摸事件")
+    
+    try:
+        return FramebufferBackend(args.framebuffer, width=width, height=height,
+                                  bits_per_pixel=args.fb_bpp)
+    except FramebufferError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
 
 def main():
     """主函数"""
-    # 尝试获取实际屏幕尺寸
-    try:
-        info = pygame.display.Info()
-        width = info.current_w
-        height = info.current_h
-    except:
-        # 默认尺寸（树莓派常见分辨率）
-        width = 1920
-        height = 1080
+    args = parse_args()
+    framebuffer = None
+    
+    if args.framebuffer:
+        framebuffer = open_framebuffer(args)
+        width = framebuffer.info.width
+        height = framebuffer.info.height
+    else:
+        # 尝试获取实际屏幕尺寸
+        try:
+            info = pygame.display.Info()
+            width = info.current_w
+            height = info.current_h
+        except:
+            # 默认尺寸（树莓派常见分辨率）
+            width = 1920
+            height = 1080
     
     print(f"屏幕分辨率: {width}x{height}")
     print("按键说明:")
@@ -727,6 +1113,7 @@ def main():
     print("  S - 切换照片缩放模式（覆盖/适应）")
     print("  A - 切换自动/手动切换照片模式")
     print("  左/右箭头键 - 切换照片")
+    print("  M - 打印内存调节指标")
     print("")
     print("计时器控制:")
     print("  T - 启动/暂停计时器")
@@ -741,7 +1128,7 @@ def main():
     print("  向左滑动 - 下一张照片")
     print("  向右滑动 - 上一张照片")
     
-    clock_app = SimpleClock(width=width, height=height, fullscreen=True)
+    clock_app = SimpleClock(width=width, height=height, fullscreen=True, framebuffer=framebuffer)
     clock_app.run()
 
 if __name__ == "__main__":
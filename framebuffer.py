@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Linux 帧缓冲（/dev/fb0）输出后端
+在没有 X/Wayland 的树莓派 Lite 系统上，把离屏 Surface 中变化的行直接写入内存映射的帧缓冲设备
+"""
+
+import mmap
+import os
+import stat
+import struct
+
+import pygame
+
+
+# linux/fb.h 中的 ioctl 请求号
+FBIOGET_VSCREENINFO = 0x4600
+FBIOGET_FSCREENINFO = 0x4602
+
+# fb_var_screeninfo 前 20 个字段：
+# xres, yres, xres_virtual, yres_virtual, xoffset, yoffset, bits_per_pixel, grayscale,
+# red/green/blue/transp 各 (offset, length, msb_right)
+FB_VAR_FORMAT = "=20I"
+# fb_fix_screeninfo 到 line_length 为止：id[16], smem_start, smem_len, type, type_aux,
+# visual, xpanstep, ypanstep, ywrapstep, line_length
+FB_FIX_FORMAT = "@16sL4I3HI"
+
+# 常见像素格式对应的 (R, G, B, A) 掩码
+PIXEL_FORMATS = {
+    16: ("RGB565", (0xF800, 0x07E0, 0x001F, 0)),
+    32: ("XRGB8888", (0x00FF0000, 0x0000FF00, 0x000000FF, 0)),
+}
+
+# 比较变化区域时每次比较的行数
+DIFF_BAND_ROWS = 16
+
+
+class FramebufferError(Exception):
+    """帧缓冲设备无法使用"""
+
+
+class FramebufferInfo:
+    """帧缓冲的几何尺寸和像素格式"""
+
+    def __init__(self, width, height, bits_per_pixel, stride, masks, offset=0, size=None):
+        self.width = width
+        self.height = height
+        self.bits_per_pixel = bits_per_pixel
+        self.bytes_per_pixel = bits_per_pixel // 8
+        self.stride = stride  # 每行字节数（可能大于 width * bytes_per_pixel）
+        self.masks = masks  # (R, G, B, A) 掩码
+        self.offset = offset  # 可见区域在映射内存中的起始偏移
+        self.size = size if size is not None else offset + stride * height  # 映射的字节数
+
+    @property
+    def format_name(self):
+        for name, masks in PIXEL_FORMATS.values():
+            if masks == self.masks:
+                return name
+        return f"{self.bits_per_pixel}bpp"
+
+    def __repr__(self):
+        return (f"FramebufferInfo({self.width}x{self.height}, {self.format_name}, "
+                f"stride={self.stride}, offset={self.offset})")
+
+
+def mask_from_bitfield(offset, length):
+    """由 fb_bitfield 的偏移和长度得到掩码"""
+    if length == 0:
+        return 0
+    return ((1 << length) - 1) << offset
+
+
+def read_ioctl_info(fd):
+    """通过 ioctl 读取帧缓冲信息，设备不支持时返回 None"""
+    try:
+        import fcntl
+    except ImportError:
+        return None
+
+    try:
+        var = fcntl.ioctl(fd, FBIOGET_VSCREENINFO, bytes(160))
+        fix = fcntl.ioctl(fd, FBIOGET_FSCREENINFO, bytes(128))
+    except OSError:
+        return None
+
+    fields = struct.unpack_from(FB_VAR_FORMAT, var)
+    xres, yres, _, _, xoffset, yoffset, bits_per_pixel = fields[:7]
+    red, green, blue, transp = fields[8:11], fields[11:14], fields[14:17], fields[17:20]
+    fix_fields = struct.unpack_from(FB_FIX_FORMAT, fix)
+    smem_len = fix_fields[2]
+    line_length = fix_fields[-1]
+
+    masks = (
+        mask_from_bitfield(red[0], red[1]),
+        mask_from_bitfield(green[0], green[1]),
+        mask_from_bitfield(blue[0], blue[1]),
+        mask_from_bitfield(transp[0], transp[1]),
+    )
+    # 像素中的 alpha 位不用于显示，按 XRGB 处理
+    masks = masks[:3] + (0,)
+    stride = line_length or xres * bits_per_pixel // 8
+    offset = yoffset * stride + xoffset * bits_per_pixel // 8
+    return FramebufferInfo(xres, yres, bits_per_pixel, stride, masks, offset, smem_len or None)
+
+
+def read_sysfs_info(device_name, sysfs_root="/sys/class/graphics"):
+    """从 sysfs 读取帧缓冲信息，无法读取时返回 None"""
+    base = os.path.join(sysfs_root, device_name)
+    try:
+        with open(os.path.join(base, "virtual_size")) as f:
+            width, height = (int(v) for v in f.read().strip().split(","))
+        with open(os.path.join(base, "bits_per_pixel")) as f:
+            bits_per_pixel = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+    try:
+        with open(os.path.join(base, "stride")) as f:
+            stride = int(f.read().strip())
+    except (OSError, ValueError):
+        stride = width * bits_per_pixel // 8
+
+    if bits_per_pixel not in PIXEL_FORMATS:
+        return None
+    return FramebufferInfo(width, height, bits_per_pixel, stride, PIXEL_FORMATS[bits_per_pixel][1])
+
+
+class FramebufferBackend:
+    """内存映射的帧缓冲输出
+
+    先在 create_surface() 创建的离屏 Surface（与帧缓冲像素格式相同）中绘制，
+    再调用 present() 只把发生变化的行复制到帧缓冲。
+    path 可以是普通文件，此时必须通过 width/height/bits_per_pixel 指定尺寸，便于在没有屏幕的环境中测试。
+    """
+
+    def __init__(self, path="/dev/fb0", width=None, height=None, bits_per_pixel=None,
+                 stride=None, sysfs_root="/sys/class/graphics"):
+        self.path = path
+        try:
+            self.file = open(path, "r+b")
+        except OSError as e:
+            raise FramebufferError(f"无法打开 {path}: {e}")
+        try:
+            self.info = self.read_info(width, height, bits_per_pixel, stride, sysfs_root)
+            self.map = self.open_map()
+        except Exception:
+            self.file.close()
+            raise
+
+        self.convert_surface = None  # 像素格式不同时用于转换的 Surface（按需创建）
+        self.shadow = None  # 上一次写入帧缓冲的画面，用于找出变化的行
+        self.frames = 0
+        self.rows_written = 0
+        print(f"帧缓冲输出: {path} {self.info}")
+
+    def read_info(self, width, height, bits_per_pixel, stride, sysfs_root):
+        """确定帧缓冲尺寸和像素格式：优先使用参数，其次 ioctl，最后 sysfs"""
+        if width and height and bits_per_pixel:
+            if bits_per_pixel not in PIXEL_FORMATS:
+                raise FramebufferError(f"不支持的像素位数: {bits_per_pixel}")
+            stride = stride or width * bits_per_pixel // 8
+            return FramebufferInfo(width, height, bits_per_pixel, stride,
+                                   PIXEL_FORMATS[bits_per_pixel][1])
+
+        info = None
+        if stat.S_ISCHR(os.fstat(self.file.fileno()).st_mode):
+            info = read_ioctl_info(self.file.fileno())
+            if info is None:
+                info = read_sysfs_info(os.path.basename(self.path), sysfs_root)
+        if info is None:
+            raise FramebufferError(f"无法读取 {self.path} 的尺寸和像素格式，请手动指定")
+        if info.bits_per_pixel not in PIXEL_FORMATS:
+            raise FramebufferError(f"不支持的像素位数: {info.bits_per_pixel}")
+        return info
+
+    def open_map(self):
+        """把帧缓冲映射到内存；普通文件不够大时自动扩展"""
+        needed = self.info.offset + self.info.stride * self.info.height
+        size = max(self.info.size, needed)
+        st = os.fstat(self.file.fileno())
+        if stat.S_ISREG(st.st_mode) and st.st_size < size:
+            self.file.truncate(size)
+        try:
+            return mmap.mmap(self.file.fileno(), size, mmap.MAP_SHARED,
+                             mmap.PROT_READ | mmap.PROT_WRITE)
+        except (OSError, ValueError) as e:
+            raise FramebufferError(f"无法映射 {self.path}: {e}")
+
+    def create_surface(self):
+        """创建与帧缓冲像素格式相同的离屏 Surface，像素格式转换在 blit 时由 SDL 完成"""
+        info = self.info
+        return pygame.Surface((info.width, info.height), 0, info.bits_per_pixel, info.masks)
+
+    def dirty_rows(self, data, pitch):
+        """比较上一帧，返回变化的行区间列表 [(起始行, 结束行), ...]
+
+        data 是画面像素的 memoryview；用 bytearray.startswith 逐段比较，
+        直接 memcmp 而不复制任何数据。
+        """
+        height = self.info.height
+        if self.shadow is None or len(self.shadow) != len(data):
+            self.shadow = bytearray(len(data))
+            return [(0, height)]
+
+        spans = []
+        shadow = self.shadow
+        for top in range(0, height, DIFF_BAND_ROWS):
+            bottom = min(height, top + DIFF_BAND_ROWS)
+            start, end = top * pitch, bottom * pitch
+            if not shadow.startswith(data[start:end], start):
+                if spans and spans[-1][1] == top:
+                    spans[-1] = (spans[-1][0], bottom)
+                else:
+                    spans.append((top, bottom))
+        return spans
+
+    def present(self, surface):
+        """把画面写入帧缓冲，与上一帧逐段比较，只复制变化的行，返回写入的行数"""
+        info = self.info
+        if surface.get_size() != (info.width, info.height):
+            raise FramebufferError(f"画面尺寸 {surface.get_width()}x{surface.get_height()} "
+                                   f"与帧缓冲 {info.width}x{info.height} 不一致")
+        if surface.get_bitsize() != self.info.bits_per_pixel or surface.get_masks() != self.info.masks:
+            # 像素格式不同时先转换（只有这种情况才需要额外的整屏缓冲）
+            if self.convert_surface is None:
+                self.convert_surface = self.create_surface()
+            self.convert_surface.blit(surface, (0, 0))
+            surface = self.convert_surface
+
+        pitch = surface.get_pitch()
+        row_bytes = info.width * info.bytes_per_pixel
+        written = 0
+        # 直接引用 Surface 的像素内存，只有变化的行才会被复制（到帧缓冲和上一帧副本）
+        with memoryview(surface.get_buffer()) as view, view.cast("B") as data:
+            for top, bottom in self.dirty_rows(data, pitch):
+                start, end = top * pitch, bottom * pitch
+                self.shadow[start:end] = data[start:end]
+                if pitch == info.stride:
+                    # 行宽一致时整段复制
+                    dst = info.offset + top * info.stride
+                    self.map[dst:dst + end - start] = data[start:end]
+                else:
+                    for row in range(top, bottom):
+                        dst = info.offset + row * info.stride
+                        src = row * pitch
+                        self.map[dst:dst + row_bytes] = data[src:src + row_bytes]
+                written += bottom - top
+
+        self.frames += 1
+        self.rows_written += written
+        return written
+
+    def close(self):
+        """关闭帧缓冲"""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if not self.file.closed:
+            self.file.close()
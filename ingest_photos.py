@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+照片预处理工具
+把相机导出的原始照片（大尺寸 JPEG、PNG 截图、带 EXIF 旋转信息的照片等）
+按显示分辨率批量处理到照片目录，并生成时钟程序使用的照片清单 manifest.json
+
+用法：
+    python3 ingest_photos.py ~/相机照片 -o photos --size 1920x1080
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# 支持的图片格式
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tif', '.tiff'}
+
+# 输出格式：BMP 解码最快但文件较大，JPEG（基线、4:2:0 采样）解码较快且文件小
+OUTPUT_FORMATS = {
+    "jpg": ("JPEG", ".jpg"),
+    "bmp": ("BMP", ".bmp"),
+}
+
+# EXIF 中表示旋转 90 度的方向值（宽高互换）
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def target_size(width, height, target_width, target_height, mode):
+    """计算缩放后的尺寸（只缩小不放大）
+
+    cover: 缩放到刚好覆盖屏幕，不裁剪，时钟仍可以在覆盖/适应模式之间切换
+    fit: 缩放到完整放进屏幕
+    """
+    scale_x = target_width / width
+    scale_y = target_height / height
+    scale = max(scale_x, scale_y) if mode == "cover" else min(scale_x, scale_y)
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def output_name(relative, extension):
+    """根据源文件相对路径生成输出文件名（加上路径哈希避免重名）"""
+    digest = hashlib.sha1(relative.encode("utf-8")).hexdigest()[:8]
+    return f"{Path(relative).stem}-{digest}{extension}"
+
+
+def process_photo(task):
+    """处理单张照片（在子进程中运行），返回处理结果"""
+    source = task["source_path"]
+    output = Path(task["output_path"])
+    temp = output.with_name(output.name + ".tmp")
+    result = {
+        "source": task["source"],
+        "size": task["size"],
+        "mtime_ns": task["mtime_ns"],
+    }
+    try:
+        with Image.open(source) as img:
+            orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+            want_width, want_height = task["width"], task["height"]
+            if orientation in ROTATED_ORIENTATIONS:
+                want_width, want_height = want_height, want_width
+
+            # JPEG 可以直接以较低分辨率解码，大幅减少大照片的解码时间
+            img.draft("RGB", (want_width, want_height))
+            img.load()
+
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            size = target_size(img.width, img.height, task["width"], task["height"], task["mode"])
+            if size != img.size:
+                img = img.resize(size, Image.LANCZOS)
+
+            # 先写临时文件再替换，避免中断时留下不完整的照片
+            pil_format = OUTPUT_FORMATS[task["format"]][0]
+            if pil_format == "JPEG":
+                img.save(temp, pil_format, quality=task["quality"], subsampling=2, progressive=False)
+            else:
+                img.save(temp, pil_format)
+            os.replace(temp, output)
+
+            result["file"] = output.name
+            result["width"], result["height"] = img.size
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        try:
+            temp.unlink()
+        except OSError:
+            pass
+    return result
+
+
+def load_manifest(path):
+    """读取已有的照片清单，不存在或损坏时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """写入照片清单"""
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp, path)
+
+
+def scan_sources(source_dir, output_dir):
+    """扫描源目录（输出目录位于源目录中时跳过输出目录），返回 {相对路径: 文件路径}"""
+    exclude = output_dir if source_dir in output_dir.parents else None
+    sources = {}
+    for path in sorted(source_dir.rglob("*")):
+        if exclude is not None and exclude in path.parents:
+            continue
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+            sources[path.relative_to(source_dir).as_posix()] = path
+    return sources
+
+
+def ingest(source_dir, output_dir, width, height, mode, fmt, quality, workers):
+    """批量处理照片，返回新的照片清单；扫描结果可疑时不做任何修改并返回 None"""
+    source_dir = Path(source_dir).resolve()
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    target = {"width": width, "height": height, "mode": mode, "format": fmt, "quality": quality}
+    old = load_manifest(manifest_path)
+    if old is not None and old.get("target") != target:
+        print("处理参数已变化，重新处理所有照片")
+    reusable = old is not None and old.get("target") == target
+    old_entries = {}
+    if old is not None:
+        for entry in old.get("photos", []) + old.get("errors", []):
+            old_entries[entry["source"]] = entry
+
+    sources = scan_sources(source_dir, output_dir)
+    if not sources and old_entries:
+        # 源目录为空很可能是路径写错，不能因此清空照片清单并删除已生成的照片
+        print(f"错误: 原始照片目录中没有找到图片，但已有照片清单包含 {len(old_entries)} 张照片，"
+              f"未做任何修改")
+        return None
+    extension = OUTPUT_FORMATS[fmt][1]
+    kept = {}
+    tasks = []
+    for relative, path in sources.items():
+        st = path.stat()
+        entry = old_entries.get(relative)
+        # 源文件未变化且输出文件仍在时跳过（损坏的文件未变化时也不再重试）
+        if (reusable and entry is not None and entry["size"] == st.st_size
+                and entry["mtime_ns"] == st.st_mtime_ns
+                and ("error" in entry or (output_dir / entry["file"]).exists())):
+            kept[relative] = entry
+            continue
+        tasks.append({
+            "source": relative,
+            "source_path": str(path),
+            "output_path": str(output_dir / output_name(relative, extension)),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            **target,
+        })
+
+    print(f"共 {len(sources)} 张照片: {len(tasks)} 张需要处理, {len(kept)} 张未变化")
+
+    results = dict(kept)
+    if tasks:
+        start = time.monotonic()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for done, result in enumerate(executor.map(process_photo, tasks, chunksize=1), 1):
+                results[result["source"]] = result
+                status = "失败" if "error" in result else "完成"
+                print(f"[{done}/{len(tasks)}] {status}: {result['source']}")
+        print(f"处理用时 {time.monotonic() - start:.1f} 秒")
+
+    # 删除源文件已不存在或已重新命名的旧输出
+    current_files = {r["file"] for r in results.values() if "file" in r}
+    for entry in old_entries.values():
+        name = entry.get("file")
+        if name and name not in current_files:
+            try:
+                (output_dir / name).unlink()
+                print(f"删除过期照片: {name}")
+            except OSError:
+                pass
+
+    photos = [results[k] for k in sorted(results) if "error" not in results[k]]
+    errors = [results[k] for k in sorted(results) if "error" in results[k]]
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "target": target,
+        "photos": photos,
+        "errors": errors,
+    }
+    save_manifest(manifest_path, manifest)
+
+    if errors:
+        print(f"以下 {len(errors)} 张照片无法处理，已跳过:")
+        for entry in errors:
+            print(f"  {entry['source']}: {entry['error']}")
+    print(f"照片清单已写入: {manifest_path}（{len(photos)} 张照片）")
+    return manifest
+
+
+def parse_size(value):
+    """解析 WxH 格式的尺寸"""
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸格式应为 WxH，例如 1920x1080: {value}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"尺寸必须大于 0: {value}")
+    return width, height
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="批量预处理照片，生成时钟使用的照片清单")
+    parser.add_argument("source", help="原始照片目录")
+    parser.add_argument("-o", "--output", default="photos", help="输出目录（默认: photos）")
+    parser.add_argument("--size", type=parse_size, default=(1920, 1080),
+                        help="显示分辨率（默认: 1920x1080）")
+    parser.add_argument("--mode", choices=("cover", "fit"), default="cover",
+                        help="cover: 缩放到覆盖屏幕（默认），fit: 缩放到适应屏幕")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="jpg",
+                        help="输出格式（默认: jpg；bmp 解码最快但文件较大）")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG 质量 1-95（默认: 90）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="并行进程数（默认: CPU 核心数）")
+    args = parser.parse_args()
+
+    if not 1 <= args.quality <= 95:
+        parser.error(f"JPEG 质量必须在 1-95 之间: {args.quality}")
+    if args.workers < 1:
+        parser.error(f"并行进程数必须大于 0: {args.workers}")
+
+    source_dir = Path(args.source)
+    if not source_dir.is_dir():
+        print(f"错误: 原始照片目录 '{args.source}' 不存在")
+        sys.exit(1)
+    if source_dir.resolve() == Path(args.output).resolve():
+        print("错误: 输出目录不能与原始照片目录相同")
+        sys.exit(1)
+
+    width, height = args.size
+    manifest = ingest(source_dir, args.output, width, height, args.mode, args.format,
+                      args.quality, args.workers)
+    if manifest is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
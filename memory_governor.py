@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存压力调节器
+定期采样进程 RSS 和 /proc/meminfo 中的可用内存，
+根据内存压力动态调整照片缓存大小、背景缓存大小和照片解码分辨率
+"""
+
+import os
+import time
+
+
+# 压力等级
+LEVEL_NORMAL = "normal"
+LEVEL_LOW = "low"
+LEVEL_CRITICAL = "critical"
+
+LEVEL_NAMES = {
+    LEVEL_NORMAL: "正常",
+    LEVEL_LOW: "紧张",
+    LEVEL_CRITICAL: "严重不足",
+}
+
+
+def read_meminfo(path="/proc/meminfo"):
+    """读取系统内存信息，返回 (总内存, 可用内存)，单位字节；无法读取时返回 (None, None)"""
+    total = None
+    available = None
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    total = int(line.split()[1]) * 1024
+                elif line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                if total is not None and available is not None:
+                    break
+    except (OSError, ValueError, IndexError):
+        return None, None
+    return total, available
+
+
+def read_rss(path="/proc/self/status"):
+    """读取当前进程的常驻内存（RSS），单位字节；无法读取时返回 None"""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class MemoryBudget:
+    """某一压力等级下的缓存预算"""
+
+    def __init__(self, level, photo_cache_size, background_cache_size, decode_scale, keep_fonts):
+        self.level = level
+        self.photo_cache_size = photo_cache_size  # 最多缓存的已解码照片数
+        self.background_cache_size = background_cache_size  # 最多缓存的已缩放背景数
+        self.decode_scale = decode_scale  # 解码分辨率（相对屏幕尺寸的比例）
+        self.keep_fonts = keep_fonts  # 是否保留暂时不用的字体
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryBudget) and self.as_tuple() == other.as_tuple()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def as_tuple(self):
+        return (self.level, self.photo_cache_size, self.background_cache_size,
+                self.decode_scale, self.keep_fonts)
+
+    def __repr__(self):
+        return (f"MemoryBudget(level={self.level}, photos={self.photo_cache_size}, "
+                f"backgrounds={self.background_cache_size}, decode_scale={self.decode_scale}, "
+                f"keep_fonts={self.keep_fonts})")
+
+
+class MemoryGovernor:
+    """内存压力调节器
+
+    可用内存比例低于 low_ratio 进入"紧张"，低于 critical_ratio 进入"严重不足"；
+    恢复时需要高出阈值 recover_margin，避免在阈值附近来回抖动。
+    """
+
+    def __init__(self, frame_bytes, sample_interval=5.0,
+                 low_ratio=0.15, critical_ratio=0.07, recover_margin=0.05,
+                 max_photo_cache=32, meminfo_path="/proc/meminfo",
+                 status_path="/proc/self/status"):
+        self.frame_bytes = max(1, frame_bytes)  # 一张屏幕大小照片占用的字节数
+        self.sample_interval = sample_interval  # 采样间隔（秒）
+        self.low_ratio = low_ratio
+        self.critical_ratio = critical_ratio
+        self.recover_margin = recover_margin
+        self.max_photo_cache = max_photo_cache
+        self.meminfo_path = meminfo_path
+        self.status_path = status_path
+
+        self.level = LEVEL_NORMAL
+        self.budget = None
+        self.last_sample_time = None
+
+        # 指标
+        self.rss = None
+        self.mem_total = None
+        self.mem_available = None
+        self.samples = 0
+        self.level_changes = 0
+        self.budget_changes = 0
+        self.last_decision = None
+
+    def enabled(self):
+        """系统是否提供 /proc/meminfo（非 Linux 系统上调节器不起作用）"""
+        return os.path.exists(self.meminfo_path)
+
+    def classify(self, total, available):
+        """根据可用内存比例判断压力等级（带回滞）"""
+        if not total or available is None:
+            return LEVEL_NORMAL
+        ratio = available / total
+
+        if self.level == LEVEL_CRITICAL:
+            if ratio < self.critical_ratio + self.recover_margin:
+                return LEVEL_CRITICAL
+        elif ratio < self.critical_ratio:
+            return LEVEL_CRITICAL
+
+        if self.level in (LEVEL_LOW, LEVEL_CRITICAL):
+            if ratio < self.low_ratio + self.recover_margin:
+                return LEVEL_LOW
+        elif ratio < self.low_ratio:
+            return LEVEL_LOW
+
+        return LEVEL_NORMAL
+
+    def budget_for(self, level, available):
+        """计算某一压力等级下的缓存预算"""
+        if level == LEVEL_CRITICAL:
+            return MemoryBudget(level, 1, 1, 0.5, False)
+        if level == LEVEL_LOW:
+            return MemoryBudget(level, 2, 1, 0.5, True)
+
+        # 正常情况下用可用内存的四分之一缓存照片，大内存设备可以缓存更多
+        if available is None:
+            photo_cache = 4
+        else:
+            photo_cache = int(available * 0.25 / self.frame_bytes)
+        photo_cache = max(2, min(self.max_photo_cache, photo_cache))
+        background_cache = max(1, min(8, photo_cache // 2))
+        return MemoryBudget(level, photo_cache, background_cache, 1.0, True)
+
+    def sample(self):
+        """采样一次内存状态，返回最新的预算"""
+        self.mem_total, self.mem_available = read_meminfo(self.meminfo_path)
+        self.rss = read_rss(self.status_path)
+        self.samples += 1
+
+        level = self.classify(self.mem_total, self.mem_available)
+        budget = self.budget_for(level, self.mem_available)
+
+        # 正常等级下预算只在明显变化时调整，避免缓存大小频繁抖动
+        if (self.budget is not None and level == LEVEL_NORMAL
+                and self.budget.level == LEVEL_NORMAL
+                and abs(budget.photo_cache_size - self.budget.photo_cache_size) < 2):
+            budget = self.budget
+
+        if level != self.level:
+            self.level_changes += 1
+        self.level = level
+        return budget
+
+    def update(self, now=None):
+        """按采样间隔检查内存，预算发生变化时返回新预算，否则返回 None
+
+        系统不提供 /proc/meminfo 时不采样，保持调用方的默认缓存大小。
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.last_sample_time is not None and now - self.last_sample_time < self.sample_interval:
+            return None
+        self.last_sample_time = now
+        if not self.enabled():
+            return None
+
+        budget = self.sample()
+        if budget == self.budget:
+            return None
+
+        previous = self.budget
+        self.budget = budget
+        self.budget_changes += 1
+        self.last_decision = budget
+        self.log_decision(previous, budget)
+        return budget
+
+    def log_decision(self, previous, budget):
+        """打印调节决定"""
+        available = self.format_bytes(self.mem_available)
+        total = self.format_bytes(self.mem_total)
+        rss = self.format_bytes(self.rss)
+        action = "初始预算" if previous is None else "调整预算"
+        print(f"内存调节[{LEVEL_NAMES[budget.level]}]: {action} - "
+              f"照片缓存 {budget.photo_cache_size} 张, 背景缓存 {budget.background_cache_size} 张, "
+              f"解码比例 {budget.decode_scale}, {'保留' if budget.keep_fonts else '释放'}闲置字体 "
+              f"(可用 {available}/{total}, 进程 RSS {rss})")
+
+    def metrics(self):
+        """返回当前指标"""
+        budget = self.budget
+        return {
+            "level": self.level,
+            "rss_bytes": self.rss,
+            "mem_total_bytes": self.mem_total,
+            "mem_available_bytes": self.mem_available,
+            "samples": self.samples,
+            "level_changes": self.level_changes,
+            "budget_changes": self.budget_changes,
+            "photo_cache_size": budget.photo_cache_size if budget else None,
+            "background_cache_size": budget.background_cache_size if budget else None,
+            "decode_scale": budget.decode_scale if budget else None,
+            "keep_fonts": budget.keep_fonts if budget else None,
+        }
+
+    @staticmethod
+    def format_bytes(value):
+        """格式化字节数（MB）"""
+        if value is None:
+            return "未知"
+        return f"{value / (1024 * 1024):.0f}MB"